@@ -26,7 +26,12 @@ from os import environ
 import io
 import fitz
 import uuid
-from typing import List
+from typing import List, Tuple
+import numpy as np
+from embedding import BatchEmbedder, upload_batch, check_index_dimensions
+from routing import IndexRouter, AliasManager, COLORS
+from datetime import date
+from staging import StagingWriter
 
 
 app = func.FunctionApp(http_auth_level=func.AuthLevel.ANONYMOUS)
@@ -64,6 +69,10 @@ def Loaders(myblob: func.InputStream):
         azure_endpoint=environ.get("AZURE_OPENAI_ENDPOINT"),
         api_key=environ.get("AZURE_OPENAI_API_KEY"),)
 
+        embedder = BatchEmbedder(embeddings,
+                                 dimensions=int(environ.get("EMBEDDING_DIMENSIONS", 0)) or None,
+                                 normalize=environ.get("EMBEDDING_NORMALIZE", "false").lower() == "true")
+
         logging.info(f"****** Processing PDF Document *****")
 
         blob_content = myblob.read()
@@ -78,10 +87,30 @@ def Loaders(myblob: func.InputStream):
 
         logging.info(f"****** Loading Index *****")
 
-        AISearchIndexLoader(embeddings,credential,logging,int(environ.get("AZURE_AI_SEARCH_BATCH_SIZE"))).populate_search_index(chunks)
-
+        # Tenant/collection routing key is the first folder under the container: load/<key>/file.pdf
+        folders = myblob.name.split('/')[1:-1]
+        router = IndexRouter.from_environ()
+        shard = router.shard_for(folders[0] if folders else None, date.today())
 
         blobManager = BlobManager()
+
+        indexLoader = AISearchIndexLoader(embedder,credential,logging,int(environ.get("AZURE_AI_SEARCH_BATCH_SIZE")),router.use_aliases)
+
+        # Embed everything before any Search call, so a Search outage does not lose the embeddings
+        batches = indexLoader.embed_chunks(chunks)
+
+        # Optionally keep chunks and embeddings as Parquet, so re-indexing does not re-embed
+        staging_container = environ.get("AZURE_STORAGE_STAGING_CONTAINER")
+        if staging_container:
+            staging_buffer = io.BytesIO()
+            staging = StagingWriter(staging_buffer, embedder.dimensions)
+            for documents, vectors in batches:
+                staging.write(documents, vectors)
+            staging.close()
+            blobManager.load_data(staging_buffer.getvalue(), f"{shard}/{file_name.rsplit('.', 1)[0]}.parquet", staging_container)
+
+        indexLoader.populate_search_index(batches, shard)
+
         
         container, blob_name = blobManager.move_blob(myblob,blob_content)
         blobManager.delete_blob(container, blob_name)
@@ -135,22 +164,32 @@ class DocumentLoader:
 
 
 class AISearchIndexLoader:
-    def __init__(self, embeddings, credential,logging, batch_size):
+    def __init__(self, embedder:BatchEmbedder, credential,logging, batch_size, use_aliases:bool=False):
         self.logger = logging
-        self.embeddings = embeddings
+        self.embedder = embedder
         self.batch_size = batch_size
+        self.use_aliases = use_aliases
        
          # Configuration for Azure Cognitive Search
         search_endpoint = environ["AZURE_AI_SEARCH_ENDPOINT"]
         self.index_name = environ["AZURE_AI_SEARCH_INDEX"]
+        self.search_endpoint = search_endpoint
+        self.credential = credential
 
-        # Create SearchClient
-        self.search_client = SearchClient(endpoint=search_endpoint, index_name=self.index_name, credential=credential)
+        # One SearchClient per resolved index, created on first upload
+        self.search_clients: dict = {}
 
         # Create SearchIndexClient
         self.search_index_client = SearchIndexClient(endpoint=search_endpoint, credential=credential)
-    
-    def populate_search_index(self,chunks:List[Document]):
+
+        self.aliases = AliasManager(self.search_index_client, logging)
+
+    def get_search_client(self, index_name:str) -> SearchClient:
+        if index_name not in self.search_clients:
+            self.search_clients[index_name] = SearchClient(endpoint=self.search_endpoint, index_name=index_name, credential=self.credential)
+        return self.search_clients[index_name]
+
+    def create_index(self):
         index_exists = False
 
         # Check if the index exists and contains documents
@@ -158,6 +197,7 @@ class AISearchIndexLoader:
             self.logger.info("Verifying if AI Search index exists...")
             index_response = self.search_index_client.get_index(self.index_name)
             index_exists = True
+            check_index_dimensions(index_response, self.embedder.dimensions)
 
         except ResourceNotFoundError:
             self.logger.info("AI Search index not found, creating index...")
@@ -179,7 +219,7 @@ class AISearchIndexLoader:
                     SearchableField(name="content", type="Edm.String", filterable=True, sortable=True),
                     SearchableField(name="title", type="Edm.String", filterable=True, sortable=True),
                     SearchableField(name="pageNumber", type="Edm.Int", filterable=True, sortable=True),
-                    SearchField(name="content_vector", type="Collection(Edm.Single)", vector_search_dimensions=1536, vector_search_profile_name="my-vector-config")
+                    SearchField(name="content_vector", type="Collection(Edm.Single)", vector_search_dimensions=self.embedder.dimensions, vector_search_profile_name="my-vector-config")
                 ],
                 
                 semantic_search= SemanticSearch(configurations=[semantic_config]),
@@ -196,55 +236,64 @@ class AISearchIndexLoader:
             except Exception as ex:
                 self.logger.info("Index was created on different thread")
 
+    def embed_chunks(self,chunks:List[Document]) -> List[Tuple[List[dict], np.ndarray]]:
+        batches = []
+        batch_size = self.batch_size
+        total_batches = (len(chunks) + batch_size - 1) // batch_size
+
+        for batches_processed, start in enumerate(range(0, len(chunks), batch_size), start=1):
+            batch = chunks[start:start + batch_size]
+
+            # Extract chunk metadata
+            documents = [{
+                "chunk_id": str(chunk.metadata["chunk_id"]),
+                "content": str(chunk.page_content),
+                "title": str(chunk.metadata["title"]),
+                "pageNumber": str(chunk.metadata["page_number"])
+            } for chunk in batch]
+
+            # Generate the embeddings for the batch as one float32 matrix
+            vectors = self.embedder.embed([document["content"] for document in documents])
+            batches.append((documents, vectors))
+
+            self.logger.info(f"Batch {batches_processed}/{total_batches} embedded.")
+
+        return batches
+
+    def populate_search_index(self,batches:List[Tuple[List[dict], np.ndarray]], shard:str):
+        # With aliases, load the blue/green index the shard alias currently points to
+        current = self.aliases.current_index(shard) if self.use_aliases else None
+        self.index_name = current or (f"{shard}-{COLORS[0]}" if self.use_aliases else shard)
+
+        self.create_index()
+
+        if self.use_aliases and current is None:
+            self.aliases.swap(shard, self.index_name)
+
        
         try:
             
-            documents = []
-            batch_size = self.batch_size 
-            total_batches = (len(chunks) + batch_size - 1) // batch_size  
-            batches_processed = 0  
+            total_batches = len(batches)
 
-            for index, chunk in enumerate(chunks):
+            for batches_processed, (documents, vectors) in enumerate(batches, start=1):
                 try:
-                    # Extract chunk metadata
-                    chunk_id = str(chunk.metadata["chunk_id"])
-                    content = str(chunk.page_content)
-                    title = str(chunk.metadata["title"])
-                    page_number = str(chunk.metadata["page_number"]) 
-                    
-                    # Generate the embedding for the content
-                    embedding = self.embeddings.embed_query(content)
-
-                    # Add the document to the batch
-                    documents.append({
-                        "chunk_id": chunk_id,
-                        "content": content,
-                        "title": title,
-                        "pageNumber": page_number,
-                        "content_vector": embedding
-                    })
-
-                    
-                    if (index + 1) % batch_size == 0 or (index + 1) == len(chunks):  
-                        result = self.search_client.upload_documents(documents=documents)
-
-                        #self.logger.info(f"Upload of batch of {len(documents)} documents succeeded: {result[0].succeeded}")
-
-                        batches_processed += 1
-                        batches_remaining = total_batches - batches_processed
-                        self.logger.info(f"Batch {batches_processed}/{total_batches} uploaded. Remaining: {batches_remaining}")
-
-                        
-                        # Clear the documents list for the next batch
-                        documents = []
+                    self.upload_documents(documents, vectors)
+
+                    batches_remaining = total_batches - batches_processed
+                    self.logger.info(f"Batch {batches_processed}/{total_batches} uploaded. Remaining: {batches_remaining}")
+
                 except Exception as ex:
-                    self.logger.info((chunk))
+                    self.logger.info((documents[0]))
                     raise ex
 
         except Exception as ex:
             self.logger.error("Error in AI Search: %s", ex)
             raise ex
 
+    def upload_documents(self, documents:List[dict], vectors:np.ndarray):
+        # Serialized with orjson directly from the float32 rows instead of boxed Python floats
+        return upload_batch(self.get_search_client(self.index_name), documents, vectors)
+
 
 class BlobManager():
 
@@ -266,7 +315,8 @@ class BlobManager():
     def move_blob(self,myblob, blob_content):
         # Delete the blob after processing
    
-        container_name, blob_name = "load", myblob.name.split('/')[-1]  # Adjust based on the blob path structure
+        # Keep the routing folders, e.g. load/<key>/file.pdf -> completed/<key>/file.pdf
+        container_name, blob_name = myblob.name.split('/', 1)
 
         blob_client_completed = self.blob_service_client.get_blob_client(container="completed", blob=blob_name)
         blob_client_completed.upload_blob(blob_content,overwrite=True)
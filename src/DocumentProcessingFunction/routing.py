@@ -0,0 +1,141 @@
+import re
+from datetime import date
+from os import environ
+from typing import List
+
+from azure.core.exceptions import ResourceNotFoundError
+from azure.search.documents.indexes import SearchIndexClient
+from azure.search.documents.indexes.models import SearchAlias
+
+
+STRATEGIES = ("none", "tenant", "collection", "date")
+
+# Blue/green physical indexes behind each shard alias
+COLORS = ("blue", "green")
+
+
+def _slug(value: str) -> str:
+    """Index names only allow lowercase letters, digits and single dashes."""
+    slug = re.sub(r"[^a-z0-9]+", "-", str(value).lower()).strip("-")
+    if not slug:
+        raise ValueError(f"Invalid shard key: {value!r}")
+    return slug
+
+
+def _months(date_from: date, date_to: date) -> List[str]:
+    months = []
+    year, month = date_from.year, date_from.month
+    while (year, month) <= (date_to.year, date_to.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+class IndexRouter:
+    """Maps documents and queries to index shards.
+
+    With the 'none' strategy everything goes to the base index. The 'tenant' and
+    'collection' strategies append the strategy and the slugged key to the base
+    name (base-tenant-<key>), 'date' appends the month (base-YYYY-MM) of the
+    document date. Tenant queries never fan out across shards.
+    """
+
+    def __init__(self, base_name: str, strategy: str = "none", use_aliases: bool = False):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown routing strategy {strategy!r}, expected one of {STRATEGIES}")
+
+        self.base_name = base_name
+        self.strategy = strategy
+        self.use_aliases = use_aliases
+
+    @classmethod
+    def from_environ(cls) -> "IndexRouter":
+        strategy = environ.get("AZURE_AI_SEARCH_ROUTING", "none").lower()
+        default_aliases = "false" if strategy == "none" else "true"
+        return cls(environ["AZURE_AI_SEARCH_INDEX"], strategy,
+                   environ.get("AZURE_AI_SEARCH_USE_ALIASES", default_aliases).lower() == "true")
+
+    @property
+    def sharded(self) -> bool:
+        return self.strategy != "none"
+
+    def shard_for(self, key: str | None = None, document_date: date | None = None) -> str:
+        """Shard a document is written to."""
+        if self.strategy == "none":
+            return self.base_name
+
+        if self.strategy == "date":
+            return f"{self.base_name}-{(document_date or date.today()):%Y-%m}"
+
+        if not key:
+            raise ValueError(f"A {self.strategy} is required to route documents")
+        return f"{self.base_name}-{self.strategy}-{_slug(key)}"
+
+    def is_shard(self, name: str) -> bool:
+        """Whether an index/alias name follows this strategy's shard naming."""
+        base = re.escape(self.base_name)
+        if self.strategy == "date":
+            return re.fullmatch(rf"{base}-\d{{4}}-\d{{2}}", name) is not None
+        return re.fullmatch(rf"{base}-{self.strategy}-[a-z0-9]+(-[a-z0-9]+)*", name) is not None
+
+    def shards_for_query(self, existing: List[str], key: str | None = None,
+                         date_from: date | None = None, date_to: date | None = None) -> List[str]:
+        """Shards a query fans out to, restricted to the shards that exist.
+
+        A 'tenant' query without a key matches no shard, only 'collection' and
+        'date' queries fan out to every shard when no key or range is given."""
+        if self.strategy == "none":
+            return [self.base_name]
+
+        existing = [name for name in existing if self.is_shard(name)]
+
+        if self.strategy == "date":
+            if not (date_from or date_to):
+                return existing
+            months = _months(date_from or date(1970, 1, 1), date_to or date.today())
+            wanted = {f"{self.base_name}-{month}" for month in months}
+            return [name for name in existing if name in wanted]
+
+        if not key:
+            return [] if self.strategy == "tenant" else existing
+
+        shard = self.shard_for(key)
+        return [shard] if shard in existing else []
+
+
+class AliasManager:
+    """Blue/green physical indexes behind an alias per shard.
+
+    Loads write to the index the alias points to. A rebuild creates the inactive
+    color, loads it, then swaps the alias, so queries keep hitting the previous
+    index until the new one is complete. The previous index is kept by default:
+    documents the Function ingests into it during a rebuild are not in the new
+    index and must be re-applied before it is dropped.
+    """
+
+    def __init__(self, index_client: SearchIndexClient, logging):
+        self.index_client = index_client
+        self.logger = logging
+
+    def current_index(self, shard: str) -> str | None:
+        try:
+            return self.index_client.get_alias(shard).indexes[0]
+        except ResourceNotFoundError:
+            return None
+
+    def inactive_index(self, shard: str) -> str:
+        current = self.current_index(shard)
+        color = COLORS[1] if current == f"{shard}-{COLORS[0]}" else COLORS[0]
+        return f"{shard}-{color}"
+
+    def swap(self, shard: str, index_name: str, delete_previous: bool = False):
+        previous = self.current_index(shard)
+        self.index_client.create_or_update_alias(SearchAlias(name=shard, indexes=[index_name]))
+        self.logger.info(f"Alias {shard} now points to {index_name}")
+
+        if previous and previous != index_name:
+            if delete_previous:
+                self.index_client.delete_index(previous)
+                self.logger.info(f"Deleted previous index {previous}")
+            else:
+                self.logger.info(f"Kept previous index {previous}, it is replaced by the next rebuild")
@@ -0,0 +1,51 @@
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# Document fields stored next to the vector column, in index field names
+DOCUMENT_FIELDS: List[str] = ["chunk_id", "content", "title", "pageNumber"]
+VECTOR_FIELD = "content_vector"
+
+
+def staging_schema(dimensions: int) -> pa.Schema:
+    return pa.schema([(field, pa.string()) for field in DOCUMENT_FIELDS] +
+                     [(VECTOR_FIELD, pa.list_(pa.float32(), dimensions))])
+
+
+class StagingWriter:
+    """Writes chunks and their embeddings to a compressed Parquet staging file.
+
+    Vectors are stored as a fixed-size-list float32 column, built from the
+    embedding matrix without copying it through Python floats.
+    """
+
+    def __init__(self, sink, dimensions: int, compression: str = "zstd"):
+        self.dimensions = dimensions
+        self.schema = staging_schema(dimensions)
+        self.writer = pq.ParquetWriter(sink, self.schema, compression=compression)
+
+    def write(self, documents: List[dict], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        columns = [pa.array([str(document[field]) for document in documents], pa.string()) for field in DOCUMENT_FIELDS]
+        columns.append(pa.FixedSizeListArray.from_arrays(pa.array(vectors.reshape(-1)), self.dimensions))
+        self.writer.write_table(pa.Table.from_arrays(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def read_staging(path: str, batch_size: int = 250) -> Iterator[Tuple[List[dict], np.ndarray]]:
+    """Stream (documents, vectors) batches from a memory-mapped staging file.
+
+    The vectors are a zero-copy NumPy view over the decoded Arrow column.
+    """
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        column = batch.column(VECTOR_FIELD)
+        vectors = column.flatten().to_numpy(zero_copy_only=True).reshape(-1, column.type.list_size)
+        documents = batch.select(DOCUMENT_FIELDS).to_pylist()
+        yield documents, vectors
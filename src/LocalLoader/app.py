@@ -25,6 +25,14 @@ from langchain_openai import AzureOpenAIEmbeddings
 from os import environ
 from dotenv import load_dotenv
 import argparse
+import os
+import shutil
+from datetime import date
+import numpy as np
+from local_index import LocalIndex
+from embedding import BatchEmbedder, upload_batch, check_index_dimensions
+from routing import IndexRouter, AliasManager, COLORS
+from staging import StagingWriter
 
 
 load_dotenv(override=False)
@@ -73,22 +81,66 @@ class DocumentLoader:
 
 
 
-class AISearchIndexLoader:
-    def __init__(self, embeddings, credential,logging):
+class AzureSearchBackend:
+    """Search backend pushing documents into an Azure AI Search index."""
+
+    def __init__(self, credential, logging, use_aliases:bool=False, rebuild:bool=False):
         self.logger = logging
-        self.embeddings = embeddings
+        self.use_aliases = use_aliases
+        self.rebuild = rebuild
        
          # Configuration for Azure Cognitive Search
         search_endpoint = environ["AZURE_AI_SEARCH_ENDPOINT"]
         self.index_name = environ["AZURE_AI_SEARCH_INDEX"]
+        self.search_endpoint = search_endpoint
+        self.credential = credential
 
-        # Create SearchClient
-        self.search_client = SearchClient(endpoint=search_endpoint, index_name=self.index_name, credential=credential)
+        # One SearchClient per resolved index, created on first upload
+        self.search_clients: dict = {}
 
         # Create SearchIndexClient
         self.search_index_client = SearchIndexClient(endpoint=search_endpoint, credential=credential)
-    
-    def populate_search_index(self,chunks:List[Document]):
+
+        self.aliases = AliasManager(self.search_index_client, logging)
+
+        # Shard alias -> freshly created index, swapped in by finalize()
+        self.rebuilt: dict = {}
+
+    def get_search_client(self, index_name:str) -> SearchClient:
+        if index_name not in self.search_clients:
+            self.search_clients[index_name] = SearchClient(endpoint=self.search_endpoint, index_name=index_name, credential=self.credential)
+        return self.search_clients[index_name]
+
+    def ensure_index(self, shard:str, dimensions:int):
+        """Resolve the physical index to load for a shard, creating it if needed."""
+        if not self.use_aliases:
+            if self.rebuild:
+                raise ValueError("Rebuilds require AZURE_AI_SEARCH_USE_ALIASES")
+            self.index_name = shard
+
+        elif self.rebuild:
+            if shard not in self.rebuilt:
+                self.rebuilt[shard] = self.aliases.inactive_index(shard)
+                # Drop the index kept from the previous swap or left by an interrupted rebuild,
+                # the alias does not point to it
+                try:
+                    self.search_index_client.delete_index(self.rebuilt[shard])
+                except ResourceNotFoundError:
+                    pass
+            self.index_name = self.rebuilt[shard]
+
+        else:
+            current = self.aliases.current_index(shard)
+            self.index_name = current or f"{shard}-{COLORS[0]}"
+
+            if current is None:
+                self._create_index(dimensions)
+                self.aliases.swap(shard, self.index_name)
+                return
+
+        self._create_index(dimensions)
+
+    def _create_index(self, dimensions:int):
         index_exists = False
 
         # Check if the index exists and contains documents
@@ -96,6 +148,7 @@ class AISearchIndexLoader:
             self.logger.info("Verifying if AI Search index exists...")
             index_response = self.search_index_client.get_index(self.index_name)
             index_exists = True
+            check_index_dimensions(index_response, dimensions)
 
         except ResourceNotFoundError:
             self.logger.info("AI Search index not found, creating index...")
@@ -117,7 +170,7 @@ class AISearchIndexLoader:
                     SearchableField(name="content", type="Edm.String", filterable=True, sortable=True),
                     SearchableField(name="title", type="Edm.String", filterable=True, sortable=True),
                     SearchableField(name="pageNumber", type="Edm.Int", filterable=True, sortable=True),
-                    SearchField(name="content_vector", type="Collection(Edm.Single)", vector_search_dimensions=1536, vector_search_profile_name="my-vector-config")
+                    SearchField(name="content_vector", type="Collection(Edm.Single)", vector_search_dimensions=dimensions, vector_search_profile_name="my-vector-config")
                 ],
                 
                 semantic_search= SemanticSearch(configurations=[semantic_config]),
@@ -134,64 +187,172 @@ class AISearchIndexLoader:
             except Exception as ex:
                 self.logger.info("Index was created on different thread")
 
+    def upload_documents(self, documents:List[dict], vectors:np.ndarray):
+        # Serialized with orjson directly from the float32 rows instead of boxed Python floats
+        return upload_batch(self.get_search_client(self.index_name), documents, vectors)
+
+    def flush(self):
+        pass
+
+    def finalize(self):
+        # Point each rebuilt shard alias at its new index once every file is loaded
+        for shard, index_name in self.rebuilt.items():
+            self.aliases.swap(shard, index_name)
+
+
+class LocalSearchBackend:
+    """Search backend writing into an on-disk LocalIndex, no Azure AI Search service required."""
+
+    def __init__(self, path:str, logging, sharded:bool=False, rebuild:bool=False):
+        self.logger = logging
+        self.path = path
+        self.sharded = sharded
+        self.rebuild = rebuild
+        self.index: LocalIndex | None = None
+        # One LocalIndex per directory, opening one reads every segment and rebuilds BM25
+        self.indexes: dict = {}
+        self.rebuilt: dict = {}
+        self.pending: List[dict] = []
+        self.pending_vectors: List[np.ndarray] = []
+
+    def ensure_index(self, shard:str, dimensions:int):
+        # Shards are subdirectories, a rebuild loads a sibling directory swapped in by finalize()
+        path = os.path.join(self.path, shard) if self.sharded else self.path
+
+        if self.rebuild:
+            if path not in self.rebuilt:
+                self.rebuilt[path] = path + ".rebuild"
+                shutil.rmtree(self.rebuilt[path], ignore_errors=True)
+            path = self.rebuilt[path]
+
+        if path not in self.indexes:
+            self.indexes[path] = LocalIndex(path, dtype=environ.get("LOCAL_INDEX_DTYPE", "float32"))
+            self.logger.info(f"Using local index at {path}")
+        self.index = self.indexes[path]
+
+    def upload_documents(self, documents:List[dict], vectors:np.ndarray):
+        # Buffer batches so each loaded file becomes a single segment
+        self.pending.extend(documents)
+        self.pending_vectors.append(vectors)
+
+    def flush(self):
+        if self.pending:
+            self.index.add_documents(self.pending, np.concatenate(self.pending_vectors))
+        self.pending = []
+        self.pending_vectors = []
+
+    def finalize(self):
+        # Release the memory-mapped segments before the directories are renamed
+        self.index = None
+        self.indexes.clear()
+
+        for path, rebuild_path in self.rebuilt.items():
+            shutil.rmtree(path + ".previous", ignore_errors=True)
+            if os.path.exists(path):
+                os.replace(path, path + ".previous")
+            os.replace(rebuild_path, path)
+            shutil.rmtree(path + ".previous", ignore_errors=True)
+            self.logger.info(f"Local index {path} rebuilt")
+
+
+class StagingBackend:
+    """Writes chunks and embeddings to Parquet staging files for bulk_upload.py, no index required."""
+
+    def __init__(self, path:str, logging):
+        self.logger = logging
+        self.path = path
+        self.writer: StagingWriter | None = None
+        self.file_path: str | None = None
+
+    def ensure_index(self, shard:str, dimensions:int):
+        # One file per loaded document, grouped by shard so bulk_upload.py can route them
+        os.makedirs(os.path.join(self.path, shard), exist_ok=True)
+        self.file_path = os.path.join(self.path, shard, f"{uuid.uuid4()}.parquet")
+        # Written under a temporary name, a failed load never leaves a .parquet without its footer
+        self.writer = StagingWriter(self.file_path + ".tmp", dimensions)
+        self.logger.info(f"Staging to {self.file_path}")
+
+    def upload_documents(self, documents:List[dict], vectors:np.ndarray):
+        self.writer.write(documents, vectors)
+
+    def flush(self):
+        if self.writer:
+            self.writer.close()
+            os.replace(self.file_path + ".tmp", self.file_path)
+            self.writer = None
+
+    def finalize(self):
+        pass
+
+
+class AISearchIndexLoader:
+    def __init__(self, embedder:BatchEmbedder, backend, logging):
+        self.logger = logging
+        self.embedder = embedder
+        self.backend = backend
+    
+    def populate_search_index(self,chunks:List[Document], shard:str):
+
+        self.backend.ensure_index(shard, self.embedder.dimensions)
        
         try:
             
-            documents = []
             batch_size = 100 
             total_batches = (len(chunks) + batch_size - 1) // batch_size  
-            batches_processed = 0  
 
-            for index, chunk in enumerate(chunks):
+            for batches_processed, start in enumerate(range(0, len(chunks), batch_size), start=1):
+                batch = chunks[start:start + batch_size]
                 try:
                     # Extract chunk metadata
-                    chunk_id = str(chunk.metadata["chunk_id"])
-                    content = str(chunk.page_content)
-                    title = str(chunk.metadata["title"])
-                    page_number = str(chunk.metadata["page_number"]) 
-                    
-                    # Generate the embedding for the content
-                    embedding = self.embeddings.embed_query(content)
-
-                    # Add the document to the batch
-                    documents.append({
-                        "chunk_id": chunk_id,
-                        "content": content,
-                        "title": title,
-                        "pageNumber": page_number,
-                        "content_vector": embedding
-                    })
-
-                    
-                    if (index + 1) % batch_size == 0 or (index + 1) == len(chunks):  
-                        result = self.search_client.upload_documents(documents=documents)
-
-                        #print(f"Upload of batch of {len(documents)} documents succeeded: {result[0].succeeded}")
-
-                        batches_processed += 1
-                        batches_remaining = total_batches - batches_processed
-                        print(f"Batch {batches_processed}/{total_batches} uploaded. Remaining: {batches_remaining}")
-
-                        
-                        # Clear the documents list for the next batch
-                        documents = []
+                    documents = [{
+                        "chunk_id": str(chunk.metadata["chunk_id"]),
+                        "content": str(chunk.page_content),
+                        "title": str(chunk.metadata["title"]),
+                        "pageNumber": str(chunk.metadata["page_number"])
+                    } for chunk in batch]
+
+                    # Generate the embeddings for the batch as one float32 matrix
+                    vectors = self.embedder.embed([document["content"] for document in documents])
+
+                    self.backend.upload_documents(documents, vectors)
+
+                    batches_remaining = total_batches - batches_processed
+                    print(f"Batch {batches_processed}/{total_batches} uploaded. Remaining: {batches_remaining}")
+
                 except Exception as ex:
-                    print(chunk)
+                    print(batch[0])
                     raise ex
 
+            self.backend.flush()
+
         except Exception as ex:
             self.logger.error("Error in AI Search: %s", ex)
             raise ex
 
 
+def create_backend(name:str, router:IndexRouter, logging, rebuild:bool=False):
+    """Create the search backend selected by --backend / SEARCH_BACKEND."""
+    if name == "local":
+        return LocalSearchBackend(environ.get("LOCAL_INDEX_PATH", "local_index"), logging, router.sharded, rebuild)
+
+    if name == "staging":
+        return StagingBackend(environ.get("STAGING_PATH", "staging"), logging)
+
+    credential = AzureKeyCredential(environ["AZURE_AI_SEARCH_KEY"])
+    return AzureSearchBackend(credential, logging, router.use_aliases, rebuild)
+
+
 
 
-def main(files: list):
+def main(files: list, backend_name: str = "azure", key: str | None = None,
+         document_date: date | None = None, rebuild: bool = False):
     
     #logging.basicConfig(level=logging.INFO)
 
    
-    credential = AzureKeyCredential(environ["AZURE_AI_SEARCH_KEY"])
+    router = IndexRouter.from_environ()
+    shard = router.shard_for(key, document_date)
+    backend = create_backend(backend_name, router, logging, rebuild)
 
     # Create embeddings using Azure OpenAI
     embeddings = AzureOpenAIEmbeddings(
@@ -201,6 +362,10 @@ def main(files: list):
         api_key=environ.get("AZURE_OPENAI_API_KEY"),
     )
 
+    embedder = BatchEmbedder(embeddings,
+                             dimensions=int(environ.get("EMBEDDING_DIMENSIONS", 0)) or None,
+                             normalize=environ.get("EMBEDDING_NORMALIZE", "false").lower() == "true")
+
 
     for file_path in files:
         file_name = file_path.split('\\')[-1] 
@@ -214,16 +379,22 @@ def main(files: list):
         print("Create embeddings")
 
         # Populate the search index with chunks
-        AISearchIndexLoader(embeddings, credential, logging).populate_search_index(chunks)
+        AISearchIndexLoader(embedder, backend, logging).populate_search_index(chunks, shard)
+
+    backend.finalize()
 
 
 if __name__ == "__main__":
     
     parser = argparse.ArgumentParser(description="Process PDF files for indexing into Azure AI Search")
     parser.add_argument('--files', type=str, required=True, help="Semicolon separated list of file paths")
+    parser.add_argument('--backend', type=str, choices=["azure", "local", "staging"], default=environ.get("SEARCH_BACKEND", "azure"), help="Search backend to load into, 'staging' only writes Parquet files for bulk_upload.py")
+    parser.add_argument('--key', type=str, help="Tenant or collection routing key (AZURE_AI_SEARCH_ROUTING=tenant|collection)")
+    parser.add_argument('--date', type=date.fromisoformat, help="Document date YYYY-MM-DD (AZURE_AI_SEARCH_ROUTING=date), defaults to today")
+    parser.add_argument('--rebuild', action='store_true', help="Load into a fresh blue/green index and swap the alias when done")
     
     args = parser.parse_args()
     
     # Split the files string into a list
     files = args.files.split(";")
-    main(files)
\ No newline at end of file
+    main(files, args.backend, args.key, args.date, args.rebuild)
\ No newline at end of file
@@ -0,0 +1,69 @@
+import argparse
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+from embedding import serialize_batch
+
+
+def make_documents(batch_size: int) -> list:
+    return [{"chunk_id": str(index), "content": "lorem ipsum " * 150, "title": "benchmark.pdf", "pageNumber": str(index)}
+            for index in range(batch_size)]
+
+
+def measure(build, serialize, repeat: int) -> dict:
+    """Memory held by one built batch, and mean time of serializing it."""
+    tracemalloc.start()
+    batch = build()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        payload = serialize(batch)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    return {"batch_mb": held / 2**20, "serialize_ms": elapsed * 1000, "payload_mb": len(payload) / 2**20}
+
+
+def main(batch_size: int, dimensions: int, repeat: int):
+    rng = np.random.default_rng(0)
+    source = rng.standard_normal((batch_size, dimensions)).astype(np.float32)
+    documents = make_documents(batch_size)
+
+    # Previous pipeline: one list[float] per document dict, serialized with the json module
+    def build_lists():
+        return [{**document, "content_vector": vector} for document, vector in zip(documents, source.tolist())]
+
+    def serialize_lists(batch):
+        return json.dumps({"value": [{"@search.action": "upload", **document} for document in batch]}).encode()
+
+    # NumPy pipeline: one contiguous float32 matrix per batch, serialized with orjson
+    def build_array():
+        return np.ascontiguousarray(np.asarray(source.tolist(), dtype=np.float32))
+
+    def serialize_array(vectors):
+        return serialize_batch(documents, vectors)
+
+    results = {
+        "list[float] + json": measure(build_lists, serialize_lists, repeat),
+        "float32 array + orjson": measure(build_array, serialize_array, repeat),
+    }
+
+    print(f"Batch of {batch_size} x {dimensions}")
+    print(f"{'pipeline':<24}{'batch MB':>10}{'serialize ms':>14}{'payload MB':>12}")
+    for name, result in results.items():
+        print(f"{name:<24}{result['batch_mb']:>10.2f}{result['serialize_ms']:>14.2f}{result['payload_mb']:>12.2f}")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark memory and serialization time of embedding batches")
+    parser.add_argument('--batch-size', type=int, default=100, help="Documents per upload batch")
+    parser.add_argument('--dimensions', type=int, default=1536, help="Embedding dimensions")
+    parser.add_argument('--repeat', type=int, default=20, help="Serialization repetitions")
+
+    args = parser.parse_args()
+    main(args.batch_size, args.dimensions, args.repeat)
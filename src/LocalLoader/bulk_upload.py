@@ -0,0 +1,94 @@
+import argparse
+import glob
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+from app import create_backend
+from routing import IndexRouter
+from staging import read_staging, VECTOR_FIELD
+
+
+load_dotenv(override=False)
+
+
+def staged_shards(path: str) -> dict:
+    """Readable staging files grouped by shard directory: <path>/<shard>/*.parquet."""
+    shards = {}
+    for file_path in sorted(glob.glob(os.path.join(path, "*", "*.parquet"))):
+        try:
+            pq.read_schema(file_path)
+        except (OSError, pa.ArrowInvalid) as ex:
+            # e.g. a file copied while it was still being written
+            logging.warning(f"Skipping unreadable staging file {file_path}: {ex}")
+            continue
+        shards.setdefault(os.path.basename(os.path.dirname(file_path)), []).append(file_path)
+    return shards
+
+
+def _upload(backend, documents: list, vectors) -> int:
+    backend.upload_documents(documents, vectors)
+    return len(documents)
+
+
+def upload_files(backend, files: list, batch_size: int, workers: int):
+    """Stream the staging files into the backend, keeping at most 2 x workers batches in flight."""
+    uploaded = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+
+        for file_path in files:
+            for documents, vectors in read_staging(file_path, batch_size):
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        uploaded += future.result()
+
+                pending.add(executor.submit(_upload, backend, documents, vectors))
+
+            print(f"Staged file {file_path} queued")
+
+        for future in pending:
+            uploaded += future.result()
+
+    return uploaded
+
+
+def main(path: str, backend_name: str, index: str | None, batch_size: int, workers: int, rebuild: bool):
+
+    router = IndexRouter.from_environ()
+    backend = create_backend(backend_name, router, logging, rebuild)
+
+    # The local backend buffers batches in order, it is not safe to fill from several threads
+    workers = workers if backend_name == "azure" else 1
+
+    for shard, files in staged_shards(path).items():
+        target = index or shard
+        dimensions = pq.read_schema(files[0]).field(VECTOR_FIELD).type.list_size
+
+        backend.ensure_index(target, dimensions)
+        uploaded = upload_files(backend, files, batch_size, workers)
+        backend.flush()
+
+        print(f"Uploaded {uploaded} documents from {len(files)} files into {target}")
+
+    backend.finalize()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Bulk upload Parquet staging files into a search index")
+    parser.add_argument('--path', type=str, default=os.environ.get("STAGING_PATH", "staging"), help="Staging directory, one subdirectory per shard")
+    parser.add_argument('--backend', type=str, choices=["azure", "local"], default=os.environ.get("SEARCH_BACKEND", "azure"), help="Search backend to upload into")
+    parser.add_argument('--index', type=str, help="Upload every shard into this index instead of the staged shard names")
+    parser.add_argument('--batch-size', type=int, default=250, help="Documents per upload request")
+    parser.add_argument('--workers', type=int, default=16, help="Parallel upload requests")
+    parser.add_argument('--rebuild', action='store_true', help="Load into a fresh blue/green index and swap the alias when done")
+
+    args = parser.parse_args()
+    main(args.path, args.backend, args.index, args.batch_size, args.workers, args.rebuild)
@@ -0,0 +1,99 @@
+from typing import List
+
+import numpy as np
+import orjson
+from azure.core.rest import HttpRequest
+
+
+# REST API version used for the raw document upload requests
+SEARCH_API_VERSION = "2023-11-01"
+
+
+class BatchEmbedder:
+    """Embeds batches of text into contiguous float32 NumPy arrays.
+
+    The vector dimension is discovered from the model on first use. Setting
+    dimensions below the model dimension truncates the vectors, which is only
+    meaningful for Matryoshka-capable models (e.g. text-embedding-3-*);
+    truncated vectors are always L2 normalized again.
+    """
+
+    def __init__(self, embeddings, dimensions: int | None = None, normalize: bool = False):
+        self.embeddings = embeddings
+        self.requested_dimensions = dimensions
+        self.normalize = normalize
+        self._model_dimensions: int | None = None
+
+    @property
+    def model_dimensions(self) -> int:
+        if self._model_dimensions is None:
+            self._model_dimensions = len(self.embeddings.embed_query("dimension probe"))
+        return self._model_dimensions
+
+    @property
+    def dimensions(self) -> int:
+        if self.requested_dimensions:
+            return min(self.requested_dimensions, self.model_dimensions)
+        return self.model_dimensions
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        return self.prepare(vectors)
+
+    def prepare(self, vectors: np.ndarray) -> np.ndarray:
+        truncated = vectors.shape[1] > self.dimensions
+        vectors = vectors[:, :self.dimensions]
+
+        if self.normalize or truncated:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            vectors = vectors / norms
+
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def check_index_dimensions(index, dimensions: int, vector_field: str = "content_vector"):
+    """Fail fast when an existing index was created for another vector dimension."""
+    field = next((field for field in index.fields if field.name == vector_field), None)
+
+    if field is not None and field.vector_search_dimensions != dimensions:
+        raise ValueError(f"Index {index.name} stores {field.vector_search_dimensions}-dimension vectors "
+                         f"but the embeddings have {dimensions} dimensions. Set EMBEDDING_DIMENSIONS to "
+                         f"{field.vector_search_dimensions} or rebuild into a new index.")
+
+
+def serialize_batch(documents: List[dict], vectors: np.ndarray, action: str = "upload",
+                    vector_field: str = "content_vector") -> bytes:
+    """Serialize an index batch to the Azure AI Search JSON payload straight from the array rows."""
+    return orjson.dumps(
+        {"value": [{"@search.action": action, **document, vector_field: vector}
+                   for document, vector in zip(documents, vectors)]},
+        option=orjson.OPT_SERIALIZE_NUMPY,
+    )
+
+
+def upload_batch(search_client, documents: List[dict], vectors: np.ndarray) -> int:
+    """Upload a batch into the index the SearchClient is bound to, halving it on HTTP 413.
+
+    The request path is relative to the client's base URL, which already
+    includes /indexes('<name>').
+    """
+    request = HttpRequest("POST", "/docs/search.index",
+                          params={"api-version": SEARCH_API_VERSION},
+                          headers={"Content-Type": "application/json"},
+                          content=serialize_batch(documents, vectors))
+
+    response = search_client.send_request(request)
+
+    if response.status_code == 413 and len(documents) > 1:
+        middle = len(documents) // 2
+        return (upload_batch(search_client, documents[:middle], vectors[:middle]) +
+                upload_batch(search_client, documents[middle:], vectors[middle:]))
+
+    response.raise_for_status()
+
+    failed = [result["key"] for result in response.json()["value"] if not result["status"]]
+    if failed:
+        raise RuntimeError(f"Upload failed for {len(failed)} documents: {failed[:5]}")
+
+    return len(documents)
@@ -8,6 +8,7 @@ from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 from model.DocumentProcessing import DocumentResource, DocumentResponse
+from typing import List
 
 # Define a prompt template for the main query processing
 template: str = """Use the provided context to answer the question. If the context does not contain the answer, simply state that you don’t know.
@@ -20,13 +21,16 @@ template: str = """Use the provided context to answer the question. If the conte
                     Answer:"""
 
 
-def get_qa_from_query(query: str) -> DocumentResponse:
-    """Perform a Q&A based on the provided query."""
+def get_qa_from_query(query: str, documents: List[DocumentResource] | None = None, **route) -> DocumentResponse:
+    """Perform a Q&A based on the provided query, optionally over already retrieved documents.
+
+    Extra keyword arguments (key, date_from, date_to) select the index shards to search."""
     print('** Q/A From Query **')
-    documents = search.hybrid_search(query)
+    if documents is None:
+        documents = search.hybrid_search(query, **route)
 
     if not documents:
-        return DocumentResponse(text="No Documents Found", Documents=[])
+        return DocumentResponse(answer="No Documents Found", Documents=[])
 
     custom_rag_prompt = PromptTemplate.from_template(template)
 
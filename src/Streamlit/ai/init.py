@@ -1,24 +1,26 @@
 from dotenv import load_dotenv
 from os import environ
 from langchain_openai import AzureChatOpenAI
+from langchain_core.language_models.chat_models import BaseChatModel
+from data.cassette import recorded_chat_model
 
 
 # Load environment variables from .env file
 load_dotenv(override=False)
 
 # Initialize the AzureChatOpenAI model
-llm: AzureChatOpenAI | None = None
+llm: BaseChatModel | None = None
 
 def initialize_llm():
     """Initialize the Azure Chat OpenAI model with specified parameters."""
     global llm
 
 
-    llm = AzureChatOpenAI(
+    llm = recorded_chat_model(lambda: AzureChatOpenAI(
         temperature=0,
         azure_deployment=environ["AZURE_OPENAI_MODEL"]
 
-    )
+    ))
 
 
 initialize_llm()
@@ -1,6 +1,7 @@
 import streamlit as st
 from model.DocumentProcessing import DocumentResource, DocumentResponse
 from ai import chat
+from data.aisearch.init import router
 
 # Set Streamlit page config
 st.set_page_config(page_title="Knowledge Retrieval Assistant", layout="wide")
@@ -40,6 +41,17 @@ with st.sidebar:
     confidence_threshold = st.slider("Confidence Threshold", 0.0, 1.0, 0.7)
     max_results = st.slider("Max Documents", 1, 10, 5)
 
+    # Restrict the search to the shards of a tenant/collection or a date range
+    route = {}
+    if router.strategy in ("tenant", "collection"):
+        route["key"] = st.text_input(router.strategy.title()) or None
+        if router.strategy == "tenant" and not route["key"]:
+            st.info("Enter a tenant to search its documents.")
+    elif router.strategy == "date":
+        date_range = st.date_input("Document Dates", value=())
+        if len(date_range) == 2:
+            route["date_from"], route["date_to"] = date_range
+
 # Main UI Title
 st.title("📚 Knowledge Retrieval Assistant")
 
@@ -59,6 +71,11 @@ with st.container():
 user_input = st.chat_input("Type your question here...")
 
 if user_input:
+    # Tenant shards are never searched without a tenant
+    if router.strategy == "tenant" and not route.get("key"):
+        st.info("Enter a tenant in the sidebar to search its documents.")
+        st.stop()
+
     # Display the user's input in chat
     with st.chat_message("user"):
         st.markdown(f"**You:** {user_input}")
@@ -67,7 +84,7 @@ if user_input:
     st.session_state.messages.append({"role": "user", "content": f"**You:** {user_input}"})
 
     # Call knowledge retrieval function
-    document_response = chat.get_qa_from_query(user_input)
+    document_response = chat.get_qa_from_query(user_input, **route)
 
     # Display the assistant's response
     with st.chat_message("assistant"):
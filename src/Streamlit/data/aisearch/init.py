@@ -1,30 +1,136 @@
 from dotenv import load_dotenv
-from os import environ
+from os import environ, listdir, path, scandir
 from langchain.globals import set_llm_cache
 from langchain_community.vectorstores.azuresearch import AzureSearch
 from langchain_openai import AzureOpenAIEmbeddings
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents import SearchClient
+from azure.search.documents.indexes import SearchIndexClient
+from data.local.index import LocalIndex
+from data.cassette import cassette, recorded
+from .routing import IndexRouter
+from typing import List
+import numpy as np
+import sys
+import time
 
 load_dotenv(override=False)
 
+# Seconds the list of existing shards, and of local index segments, is cached for
+SHARD_CACHE_SECONDS = 60
+
+# Must match the loaders: vectors truncated client side (Matryoshka models only), then L2 normalized
+EMBEDDING_DIMENSIONS : int | None = int(environ.get("EMBEDDING_DIMENSIONS", 0)) or None
+EMBEDDING_NORMALIZE : bool = environ.get("EMBEDDING_NORMALIZE", "false").lower() == "true"
+
+search_backend : str = environ.get("SEARCH_BACKEND", "azure")
+router : IndexRouter = IndexRouter.from_environ()
 vector_store : AzureSearch | None=None
+embeddings : AzureOpenAIEmbeddings | None=None
+index_client : SearchIndexClient | None=None
+
+_search_clients : dict = {}
+_local_indexes : dict = {}   # shard -> (checked at, segment files, LocalIndex)
+_shards : tuple = (0.0, [])
 
 
 def search_init():
-    global vector_store
+    global vector_store, embeddings, index_client
     
       # Use AzureOpenAIEmbeddings with an Azure account
-    embeddings: AzureOpenAIEmbeddings = AzureOpenAIEmbeddings(
+    embeddings = recorded("embeddings", lambda: AzureOpenAIEmbeddings(
         azure_deployment=environ.get("AZURE_OPENAI_EMBEDDING"),
         openai_api_version=environ.get("AZURE_OPENAI_API_VERSION"),
         azure_endpoint=environ.get("AZURE_OPENAI_ENDPOINT"),
-        api_key=environ.get("AZURE_OPENAI_API_KEY"),)
-    
+        api_key=environ.get("AZURE_OPENAI_API_KEY"),), ["embed_query"])
+
+    # Offline development and CI: query an on-disk index instead of Azure AI Search
+    if search_backend == "local":
+        return
+
+    index_client = recorded("index_client", lambda: SearchIndexClient(endpoint=environ.get("AZURE_AI_SEARCH_ENDPOINT"),
+                                     credential=AzureKeyCredential(environ.get("AZURE_AI_SEARCH_KEY"))),
+                            ["list_alias_names", "list_index_names"])
+
+    # Shards and aliases are queried through SearchClient, AzureSearch expects a single physical index.
+    # Recorded evaluation runs also go through SearchClient, so its raw responses can be replayed
+    if router.sharded or router.use_aliases or cassette:
+        return
+
     vector_store = AzureSearch(
         azure_search_endpoint=environ.get("AZURE_AI_SEARCH_ENDPOINT"),
         azure_search_key=environ.get("AZURE_AI_SEARCH_KEY"),
         index_name=environ.get("AZURE_AI_SEARCH_INDEX"),
-        embedding_function=embeddings.embed_query,
+        embedding_function=lambda text: embed_query(text).tolist(),
         semantic_configuration_name= 'default'
     )
 
-search_init()
\ No newline at end of file
+
+def embed_query(text: str) -> np.ndarray:
+    """Embed a query the way the loaders' BatchEmbedder prepares document vectors."""
+    vector = np.asarray(embeddings.embed_query(text), dtype=np.float32)
+    truncated = EMBEDDING_DIMENSIONS is not None and len(vector) > EMBEDDING_DIMENSIONS
+    vector = vector[:EMBEDDING_DIMENSIONS]
+
+    if EMBEDDING_NORMALIZE or truncated:
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm else vector
+
+    return vector
+
+
+def get_search_client(index_name: str) -> SearchClient:
+    if index_name not in _search_clients:
+        _search_clients[index_name] = recorded(f"search:{index_name}", lambda: SearchClient(endpoint=environ.get("AZURE_AI_SEARCH_ENDPOINT"),
+                                                   index_name=index_name,
+                                                   credential=AzureKeyCredential(environ.get("AZURE_AI_SEARCH_KEY"))),
+                                               ["search"])
+    return _search_clients[index_name]
+
+
+def _segment_files(index_path: str) -> tuple:
+    """Segment files and modification times, changed by new segments and by swapped in rebuilds."""
+    return tuple(sorted((entry.name, entry.stat().st_mtime_ns) for entry in scandir(index_path)
+                        if entry.name.startswith("segment-") and entry.name.endswith(".json")))
+
+
+def get_local_index(shard: str) -> LocalIndex:
+    """Local index of a shard, reopened when its segments changed, checked every SHARD_CACHE_SECONDS."""
+    root = environ.get("LOCAL_INDEX_PATH", "local_index")
+    index_path = path.join(root, shard) if router.sharded else root
+    checked_at, files, index = _local_indexes.get(shard, (0.0, None, None))
+
+    if time.monotonic() - checked_at > SHARD_CACHE_SECONDS:
+        try:
+            current = _segment_files(index_path)
+        except FileNotFoundError:
+            # A rebuild is being swapped in, keep serving the open index
+            current = files
+
+        if index is None or current != files:
+            # Windows cannot rename a directory with memory-mapped files, which the loader does
+            # to swap in a rebuild, so the segments are read into memory there
+            index = LocalIndex(index_path, mmap=sys.platform != "win32")
+
+        _local_indexes[shard] = (time.monotonic(), current, index)
+
+    return index
+
+
+def list_shards() -> List[str]:
+    """Existing shard names (aliases when enabled), cached for SHARD_CACHE_SECONDS."""
+    global _shards
+
+    if time.monotonic() - _shards[0] > SHARD_CACHE_SECONDS:
+        if search_backend == "local":
+            # Skip in-progress rebuilds (<shard>.rebuild) and swapped out indexes (<shard>.previous)
+            names = [name for name in listdir(environ.get("LOCAL_INDEX_PATH", "local_index")) if "." not in name]
+        elif router.use_aliases:
+            names = list(index_client.list_alias_names())
+        else:
+            names = list(index_client.list_index_names())
+        _shards = (time.monotonic(), names)
+
+    return _shards[1]
+
+search_init()
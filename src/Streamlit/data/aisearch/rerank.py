@@ -0,0 +1,70 @@
+from os import environ
+from typing import List
+import logging
+import numpy as np
+import time
+
+RERANK_LAMBDA: float = float(environ.get("SEARCH_RERANK_LAMBDA", 0.7))
+RERANK_BUDGET_MS: float = float(environ.get("SEARCH_RERANK_BUDGET_MS", 250))
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vectors:np.ndarray) -> np.ndarray:
+    """L2 normalize rows so dot products are cosine similarities."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _mmr(query_vector:np.ndarray, vectors:np.ndarray, k:int, lambda_mult:float,
+         deadline:float | None=None) -> List[int]:
+    """Maximal marginal relevance over normalized vectors, scored in one batch per step.
+
+    Once the deadline (a time.perf_counter() value) has passed, the remaining
+    slots are filled by relevance alone."""
+    relevance = vectors @ query_vector
+    selected = [int(np.argmax(relevance))]
+    redundancy = vectors @ vectors[selected[0]]
+    top = min(k, len(vectors))
+
+    while len(selected) < top:
+        if deadline is not None and time.perf_counter() >= deadline:
+            logger.warning("MMR reranking ran out of its %.0f ms budget after %d of %d results, "
+                           "ordering the rest by cosine similarity", RERANK_BUDGET_MS, len(selected), top)
+            remaining = [int(i) for i in np.argsort(-relevance) if i not in selected]
+            return selected + remaining[:top - len(selected)]
+
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        index = int(np.argmax(scores))
+        selected.append(index)
+        redundancy = np.maximum(redundancy, vectors @ vectors[index])
+
+    return selected
+
+
+def rerank(query_vector:np.ndarray, candidates:List[dict], k:int,
+           mode:str="cosine", lambda_mult:float=RERANK_LAMBDA,
+           budget_ms:float | None=RERANK_BUDGET_MS) -> List[dict]:
+    """Rerank candidates locally by cosine similarity or MMR.
+
+    The budget covers the reranking itself, not the embedding and candidate
+    fetch before it."""
+    if not candidates:
+        return []
+
+    deadline = time.perf_counter() + budget_ms / 1000 if budget_ms else None
+
+    vectors = _normalize(np.asarray([c["content_vector"] for c in candidates], dtype=np.float32))
+    query_vector = _normalize(np.asarray(query_vector, dtype=np.float32))
+
+    if mode == "mmr":
+        order = _mmr(query_vector, vectors, k, lambda_mult, deadline)
+    else:
+        scores = vectors @ query_vector
+        top = min(k, len(candidates))
+        order = np.argpartition(-scores, top - 1)[:top]
+        order = order[np.argsort(-scores[order])].tolist()
+
+    return [candidates[i] for i in order]
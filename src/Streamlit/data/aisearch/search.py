@@ -1,21 +1,139 @@
-from .init import vector_store
+from .init import vector_store, embed_query, search_backend, router, get_search_client, get_local_index, list_shards
+from .rerank import rerank
 from model.DocumentProcessing import DocumentResource
 from langchain.docstore.document import Document
+from azure.search.documents.models import VectorizedQuery
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from os import environ
 from typing import List
+import numpy as np
+import time
+
+# Reranking mode: 'semantic' uses the Azure semantic ranker, 'cosine' and 'mmr'
+# fetch a wider candidate set and rerank it locally on the returned vectors
+RERANK_MODE: str = environ.get("SEARCH_RERANK_MODE", "semantic").lower()
+RERANK_CANDIDATES: int = int(environ.get("SEARCH_RERANK_CANDIDATES", 50))
+
+# Maximum number of shards queried in parallel
+MAX_FANOUT: int = int(environ.get("AZURE_AI_SEARCH_MAX_FANOUT", 8))
+
+# Only the fields needed to build the response and rerank the candidates
+CANDIDATE_FIELDS: List[str] = ["title", "pageNumber", "content", "content_vector"]
+
 
 def results_to_model(result:Document) -> DocumentResource:
     return DocumentResource( title = result.metadata["title"],
                         pageNumber=result.metadata["pageNumber"],
                         content=result.page_content)
 
-                       
 
-def hybrid_search(query:str) ->List[DocumentResource]:
+def candidate_to_model(candidate:dict) -> DocumentResource:
+    return DocumentResource( title = candidate["title"],
+                        pageNumber=candidate["pageNumber"],
+                        content=candidate["content"])
+
+
+def _score(result:dict) -> float:
+    """Semantic reranker scores are absolute, otherwise fall back to the fused hybrid score."""
+    return result.get("@search.reranker_score") or result["@search.score"]
+
+
+def _search_shard(shard:str, query:str, query_vector:np.ndarray, top:int, semantic:bool) -> List[dict]:
+    """Run a hybrid query against one shard, with the semantic ranker or returning the candidate vectors."""
+    if search_backend == "local":
+        return get_local_index(shard).hybrid_search(query, query_vector, top)
+
+    vector_query = VectorizedQuery(vector=query_vector.tolist(),
+                                   k_nearest_neighbors=top,
+                                   fields="content_vector")
+
+    if semantic:
+        results = get_search_client(shard).search(search_text=query,
+                                                  vector_queries=[vector_query],
+                                                  select=CANDIDATE_FIELDS[:-1],
+                                                  query_type="semantic",
+                                                  semantic_configuration_name="default",
+                                                  top=top)
+        return list(results)
+
+    results = get_search_client(shard).search(search_text=query,
+                                              vector_queries=[vector_query],
+                                              select=CANDIDATE_FIELDS,
+                                              top=top)
+
+    results = list(results)
+    missing = sum(result.get("content_vector") is None for result in results)
+    if missing:
+        # Local reranking needs every candidate's vector, a partial set would rerank silently wrong
+        raise ValueError(f"{missing} of {len(results)} candidates from {shard} have no content_vector, "
+                         f"make the field retrievable or set SEARCH_RERANK_MODE=semantic")
+
+    return results
+
+
+def _fetch_candidates(query:str, query_vector:np.ndarray, candidates:int,
+                      shards:List[str], semantic:bool=False) -> List[dict]:
+    """Fan the query out to the shards in parallel and merge the results by score."""
+    if len(shards) == 1:
+        return _search_shard(shards[0], query, query_vector, candidates, semantic)
+
+    with ThreadPoolExecutor(max_workers=min(len(shards), MAX_FANOUT)) as executor:
+        results = executor.map(lambda shard: _search_shard(shard, query, query_vector, candidates, semantic), shards)
+        merged = [result for shard_results in results for result in shard_results]
+
+    return sorted(merged, key=_score, reverse=True)[:candidates]
+
+
+def _elapsed_ms(start:float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+def reranked_search(query:str, k:int=3, candidates:int=RERANK_CANDIDATES,
+                    mode:str=RERANK_MODE, shards:List[str] | None=None,
+                    timings:dict | None=None) -> List[DocumentResource]:
+    """Two-stage retrieval: wide hybrid candidate fetch, then local reranking.
+
+    When given, timings is filled with the embed, retrieve and rerank durations in ms."""
+    timings = {} if timings is None else timings
+    shards = shards or [router.base_name]
+
+    start = time.perf_counter()
+    query_vector = embed_query(query)
+    timings["embed"] = _elapsed_ms(start)
+
+    start = time.perf_counter()
+    if mode in ("cosine", "mmr"):
+        results = _fetch_candidates(query, query_vector, max(k, candidates), shards)
+        timings["retrieve"] = _elapsed_ms(start)
+
+        # The rerank budget starts here, embedding and the candidate fetch are network bound
+        start = time.perf_counter()
+        results = rerank(query_vector, results, k, mode)
+        timings["rerank"] = _elapsed_ms(start)
+    else:
+        # Semantic ranker on Azure, the fused RRF ranking on the local backend
+        results = _fetch_candidates(query, query_vector, k, shards, semantic=search_backend != "local")
+        timings["retrieve"] = _elapsed_ms(start)
+
+    return [candidate_to_model(result) for result in results]
+
+
+def hybrid_search(query:str, k:int=3, key:str | None=None,
+                  date_from:date | None=None, date_to:date | None=None,
+                  timings:dict | None=None) ->List[DocumentResource]:
+    """Search the shards selected by the routing key or date range (all shards when omitted).
+
+    Per-stage timings are only collected on the shard path, see reranked_search."""
+
+    if vector_store is None or RERANK_MODE in ("cosine", "mmr"):
+        shards = router.shards_for_query(list_shards() if router.sharded else [], key, date_from, date_to)
+        return reranked_search(query, k, shards=shards, timings=timings) if shards else []
 
     docs = vector_store.semantic_hybrid_search(
     query=query,
-    k=3
+    k=k
     )
 
 
-    return [results_to_model(document) for document in docs]
\ No newline at end of file
+    return [results_to_model(document) for document in docs]
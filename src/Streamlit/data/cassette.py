@@ -0,0 +1,154 @@
+from os import environ
+from typing import Any, Callable, List, Optional
+from hashlib import sha256
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import ConfigDict
+import json
+import threading
+
+
+class Cassette:
+    """Records the raw Azure AI Search and Azure OpenAI responses of a run, or replays them.
+
+    Enabled with EVAL_CASSETTE (a JSONL file) and EVAL_CASSETTE_MODE (record or
+    replay). Replaying runs the same search and chat pipeline offline on the
+    recorded embeddings, search results and completions.
+    """
+
+    def __init__(self, path: str, mode: str):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode {mode!r}, expected record or replay")
+
+        self.path = path
+        self.mode = mode
+        self.responses: dict = {}
+        self.lock = threading.Lock()
+
+        if self.replaying:
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.responses[entry["key"]] = entry["response"]
+        else:
+            open(path, "w", encoding="utf-8").close()
+
+    @classmethod
+    def from_environ(cls) -> "Cassette | None":
+        path = environ.get("EVAL_CASSETTE")
+        return cls(path, environ.get("EVAL_CASSETTE_MODE", "replay").lower()) if path else None
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def call(self, request: dict, send: Callable[[], Any]) -> Any:
+        """Return the recorded response to a request, or send it and record the response."""
+        key = sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+        if self.replaying:
+            if key not in self.responses:
+                raise KeyError(f"No recorded response for {request}")
+            return self.responses[key]
+
+        response = json.loads(json.dumps(send(), default=str))
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps({"key": key, "request": request, "response": response}) + "\n")
+        return response
+
+    def wrap(self, name: str, target: Any, methods: List[str]) -> "RecordedClient":
+        return RecordedClient(self, name, target, methods)
+
+
+class RecordedClient:
+    """Stand-in for a client (SearchClient, embeddings...) whose methods go through the cassette.
+
+    Paged results are recorded as lists. Vectors in the request are left out of
+    the key, they are the recorded query embedding."""
+
+    def __init__(self, cassette: Cassette, name: str, target: Any, methods: List[str]):
+        self._cassette = cassette
+        self._name = name
+        self._target = target
+        self._methods = methods
+
+    def __getattr__(self, method: str):
+        if method.startswith("_") or method not in self._methods:
+            raise AttributeError(f"{method} is not recorded for {self._name}")
+
+        def call(*args, **kwargs):
+            request = {"client": self._name, "method": method, "args": list(args),
+                       "kwargs": {key: _request_value(value) for key, value in kwargs.items()}}
+            return self._cassette.call(request, lambda: _response_value(getattr(self._target, method)(*args, **kwargs)))
+
+        return call
+
+
+def _request_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_request_value(item) for item in value]
+    if hasattr(value, "as_dict"):
+        return {key: item for key, item in value.as_dict().items() if key != "vector"}
+    return value
+
+
+def _response_value(value: Any) -> Any:
+    if isinstance(value, (str, bytes, dict)):
+        return value
+    try:
+        return [dict(item) if isinstance(item, dict) else item for item in value]
+    except TypeError:
+        return value
+
+
+class RecordedChatModel(BaseChatModel):
+    """Chat model answering from the cassette, recording the wrapped model's completions.
+
+    Token usage is replayed with the message, so get_openai_callback still counts it."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    cassette: Any
+    llm: Optional[BaseChatModel] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        request = {"client": "chat", "method": "generate", "stop": stop,
+                   "messages": [{"type": message.type, "content": message.content} for message in messages]}
+
+        def send():
+            result = self.llm._generate(messages, stop=stop, **kwargs)
+            message = result.generations[0].message
+            return {"content": message.content,
+                    "usage_metadata": getattr(message, "usage_metadata", None),
+                    "response_metadata": message.response_metadata,
+                    "llm_output": result.llm_output}
+
+        response = self.cassette.call(request, send)
+        message = AIMessage(content=response["content"],
+                            usage_metadata=response["usage_metadata"],
+                            response_metadata=response["response_metadata"] or {})
+        return ChatResult(generations=[ChatGeneration(message=message)], llm_output=response["llm_output"])
+
+
+cassette: Cassette | None = Cassette.from_environ()
+
+
+def recorded(name: str, factory: Callable[[], Any], methods: List[str]) -> Any:
+    """Create a client, behind the cassette when one is configured. Replaying never creates it."""
+    if cassette is None:
+        return factory()
+    return cassette.wrap(name, None if cassette.replaying else factory(), methods)
+
+
+def recorded_chat_model(factory: Callable[[], BaseChatModel]) -> BaseChatModel:
+    if cassette is None:
+        return factory()
+    return RecordedChatModel(cassette=cassette, llm=None if cassette.replaying else factory())
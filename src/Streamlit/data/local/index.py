@@ -0,0 +1,225 @@
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import List, Set
+
+import numpy as np
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Reciprocal rank fusion constant, matching Azure AI Search hybrid ranking
+RRF_K = 60
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _train_ivf(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0):
+    """Spherical k-means over normalized vectors, returns (centroids, assignments)."""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(len(vectors), nlist * 64), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        for list_id in range(nlist):
+            members = sample[labels == list_id]
+            if len(members):
+                centroids[list_id] = members.mean(axis=0)
+        centroids = _normalize(centroids)
+
+    assignments = np.concatenate([np.argmax(block @ centroids.T, axis=1)
+                                  for block in np.array_split(vectors, max(1, len(vectors) // 8192))])
+    return centroids.astype(np.float32), assignments.astype(np.int32)
+
+
+class BM25:
+    """In-memory BM25 keyword index, built incrementally as segments are added."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)
+        self.doc_lengths: List[int] = []
+
+    def add(self, text: str):
+        doc_id = len(self.doc_lengths)
+        terms = Counter(tokenize(text))
+        for term, frequency in terms.items():
+            self.postings[term][doc_id] = frequency
+        self.doc_lengths.append(sum(terms.values()))
+
+    def search(self, query: str, top: int, exclude: Set[int] = frozenset()) -> List[tuple]:
+        count = len(self.doc_lengths)
+        if not count:
+            return []
+
+        average_length = sum(self.doc_lengths) / count
+        scores = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                if doc_id in exclude:
+                    continue
+                length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + length_norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+class LocalIndex:
+    """Offline hybrid index persisted to a directory.
+
+    Every add_documents call writes a new segment: a float32/float16 .npy vector
+    matrix that is memory-mapped on load, a JSON file with the document fields and,
+    for large segments, an IVF coarse quantizer. Keyword search uses BM25 and the
+    two result lists are fused with reciprocal rank fusion, mimicking Azure AI
+    Search hybrid queries. Like the Azure upload action, a document replaces the
+    one with the same chunk_id: the older row stays on disk but is masked out.
+    With mmap=False the vectors are read into memory and no file stays open.
+    """
+
+    def __init__(self, path: str, dtype: str = "float32", ivf_threshold: int = 4096, nprobe: int = 8,
+                 mmap: bool = True):
+        self.path = path
+        self.mmap = mmap
+        self.dtype = np.dtype(dtype)
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+
+        self.segments: List[dict] = []
+        self.documents: List[dict] = []
+        self.bm25 = BM25()
+
+        # chunk_id -> doc id of its current version, and the doc ids it replaced
+        self.rows: dict = {}
+        self.superseded: Set[int] = set()
+
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+
+    def _segment_names(self) -> List[str]:
+        return sorted(name[:-len(".json")] for name in os.listdir(self.path)
+                      if name.startswith("segment-") and name.endswith(".json"))
+
+    def _load(self):
+        for name in self._segment_names():
+            self._open_segment(name)
+
+    def _open_segment(self, name: str):
+        base = os.path.join(self.path, name)
+
+        with open(base + ".json", "r", encoding="utf-8") as file:
+            documents = json.load(file)
+
+        segment = {
+            "offset": len(self.documents),
+            "vectors": np.load(base + ".npy", mmap_mode="r" if self.mmap else None),
+            "centroids": None,
+            "assignments": None,
+            "live": np.ones(len(documents), dtype=bool),
+        }
+
+        if os.path.exists(base + ".ivf.npz"):
+            with np.load(base + ".ivf.npz") as ivf:
+                segment["centroids"] = ivf["centroids"]
+                segment["assignments"] = ivf["assignments"]
+
+        self.segments.append(segment)
+        for document in documents:
+            doc_id = len(self.documents)
+            previous = self.rows.get(document.get("chunk_id"))
+            if previous is not None:
+                self.superseded.add(previous)
+                previous_segment = self._segment(previous)
+                previous_segment["live"][previous - previous_segment["offset"]] = False
+            self.rows[document.get("chunk_id")] = doc_id
+
+            self.documents.append(document)
+            self.bm25.add(f"{document.get('title', '')} {document.get('content', '')}")
+
+    def add_documents(self, documents: List[dict], vectors: np.ndarray):
+        """Persist a batch of documents and their embeddings as a new segment."""
+        if not documents:
+            return
+
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        name = f"segment-{len(self._segment_names()) + 1:06d}"
+        base = os.path.join(self.path, name)
+
+        np.save(base + ".npy", vectors.astype(self.dtype))
+
+        if len(vectors) >= self.ivf_threshold:
+            centroids, assignments = _train_ivf(vectors, nlist=int(math.sqrt(len(vectors))))
+            np.savez(base + ".ivf.npz", centroids=centroids, assignments=assignments)
+
+        # The JSON file is written last and atomically, it marks the segment as complete
+        with open(base + ".json.tmp", "w", encoding="utf-8") as file:
+            json.dump(documents, file)
+        os.replace(base + ".json.tmp", base + ".json")
+
+        self._open_segment(name)
+
+    def vector_search(self, query_vector: np.ndarray, top: int) -> List[tuple]:
+        query_vector = _normalize(np.asarray(query_vector, dtype=np.float32))
+        hits = []
+
+        for segment in self.segments:
+            vectors = segment["vectors"]
+
+            if segment["centroids"] is not None:
+                probes = np.argsort(-(segment["centroids"] @ query_vector))[:self.nprobe]
+                rows = np.flatnonzero(np.isin(segment["assignments"], probes))
+            else:
+                rows = np.arange(len(vectors))
+
+            rows = rows[segment["live"][rows]]
+            if not len(rows):
+                continue
+
+            scores = np.asarray(vectors[rows], dtype=np.float32) @ query_vector
+            best = np.argsort(-scores)[:top]
+            hits.extend((segment["offset"] + int(rows[i]), float(scores[i])) for i in best)
+
+        return sorted(hits, key=lambda hit: hit[1], reverse=True)[:top]
+
+    def _segment(self, doc_id: int) -> dict:
+        for segment in reversed(self.segments):
+            if doc_id >= segment["offset"]:
+                return segment
+
+    def _vector(self, doc_id: int) -> np.ndarray:
+        segment = self._segment(doc_id)
+        return np.asarray(segment["vectors"][doc_id - segment["offset"]], dtype=np.float32)
+
+    def hybrid_search(self, query: str, query_vector: np.ndarray, top: int = 50) -> List[dict]:
+        """Fuse vector and BM25 rankings with RRF, returning Azure-shaped result dicts."""
+        fused = defaultdict(float)
+        for ranking in (self.vector_search(query_vector, top), self.bm25.search(query, top, self.superseded)):
+            for rank, (doc_id, _) in enumerate(ranking):
+                if doc_id in self.superseded:
+                    continue
+                fused[doc_id] += 1 / (RRF_K + rank + 1)
+
+        results = []
+        for doc_id, score in sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top]:
+            result = dict(self.documents[doc_id])
+            result["content_vector"] = self._vector(doc_id)
+            result["@search.score"] = score
+            results.append(result)
+
+        return results
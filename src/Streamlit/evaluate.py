@@ -0,0 +1,191 @@
+import argparse
+import json
+import time
+from os import environ
+from typing import List
+
+import numpy as np
+from dotenv import load_dotenv
+
+
+# Settings captured with every run so two result files can be told apart
+CONFIG_KEYS: List[str] = [
+    "SEARCH_BACKEND",
+    "AZURE_AI_SEARCH_INDEX",
+    "LOCAL_INDEX_PATH",
+    "SEARCH_RERANK_MODE",
+    "SEARCH_RERANK_CANDIDATES",
+    "DOCUMENT_CHUNK_SIZE",
+    "DOCUMENT_CHUNK_OVERLAP",
+    "AZURE_OPENAI_MODEL",
+]
+
+PERCENTILES: List[int] = [50, 95, 99]
+
+
+def load_jsonl(path: str) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def is_relevant(document: dict, example: dict) -> bool:
+    """A retrieved chunk is relevant when it comes from an expected page of the expected document."""
+    if example.get("title") and document["title"] != example["title"]:
+        return False
+    return int(document["pageNumber"]) in {int(page) for page in example["pages"]}
+
+
+def score_retrieval(documents: List[dict], example: dict, k: int) -> dict:
+    top = documents[:k]
+    found_pages = {int(document["pageNumber"]) for document in top if is_relevant(document, example)}
+    first_hit = next((rank for rank, document in enumerate(top, start=1) if is_relevant(document, example)), None)
+
+    return {
+        "recall": len(found_pages) / len(example["pages"]),
+        "reciprocal_rank": 1 / first_hit if first_hit else 0.0,
+    }
+
+
+def run_live(example: dict, k: int, answer: bool) -> dict:
+    """Run one question through search.hybrid_search and chat.get_qa_from_query, timing each stage.
+
+    Stages: search (embed, retrieve and rerank within it) and answer."""
+    from ai import chat
+    from data.aisearch import search
+    from langchain_community.callbacks.manager import get_openai_callback
+
+    # Query embedding, candidate fetch and local reranking are timed inside search
+    stages = {}
+    start = time.perf_counter()
+    documents = search.hybrid_search(example["question"], k=k, key=example.get("key"), timings=stages)
+    search_ms = (time.perf_counter() - start) * 1000
+
+    response = {
+        "question": example["question"],
+        "documents": [document.model_dump() for document in documents],
+        "answer": None,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "latency_ms": {"search": search_ms, **stages},
+    }
+
+    if answer and documents:
+        with get_openai_callback() as callback:
+            start = time.perf_counter()
+            response["answer"] = chat.get_qa_from_query(example["question"], documents=documents).answer
+            response["latency_ms"]["answer"] = (time.perf_counter() - start) * 1000
+
+        response["prompt_tokens"] = callback.prompt_tokens
+        response["completion_tokens"] = callback.completion_tokens
+
+    return response
+
+
+def summarize(queries: List[dict], k: int, prompt_price: float, completion_price: float,
+              latency_prefix: str = "") -> dict:
+    summary = {
+        f"recall@{k}": float(np.mean([query["recall"] for query in queries])),
+        "mrr": float(np.mean([query["reciprocal_rank"] for query in queries])),
+        "prompt_tokens": float(np.mean([query["prompt_tokens"] for query in queries])),
+        "cost_per_query": float(np.mean([query["prompt_tokens"] / 1000 * prompt_price +
+                                         query["completion_tokens"] / 1000 * completion_price
+                                         for query in queries])),
+    }
+
+    stages = sorted({stage for query in queries for stage in query["latency_ms"]})
+    for stage in stages:
+        latencies = [query["latency_ms"][stage] for query in queries if stage in query["latency_ms"]]
+        for percentile in PERCENTILES:
+            summary[f"{latency_prefix}{stage}_p{percentile}_ms"] = float(np.percentile(latencies, percentile))
+
+    return summary
+
+
+def run(args):
+    if args.env_file:
+        # Loaded before the ai/data modules so their load_dotenv(override=False) keeps these values
+        load_dotenv(args.env_file, override=True)
+
+    # The raw search and LLM responses are recorded/replayed underneath the pipeline (data/cassette.py),
+    # configured before the ai/data modules are imported by run_live
+    if args.record or args.replay:
+        environ["EVAL_CASSETTE"] = args.record or args.replay
+        environ["EVAL_CASSETTE_MODE"] = "record" if args.record else "replay"
+
+    dataset = load_jsonl(args.dataset)
+
+    queries = []
+    for example in dataset:
+        response = run_live(example, args.k, not args.no_answer)
+        queries.append({**response, **score_retrieval(response["documents"], example, args.k)})
+        print(f"{len(queries)}/{len(dataset)} {example['question'][:60]}")
+
+    # Replayed latencies exclude every network call, keep them apart from measured ones
+    result = {
+        "label": args.label or args.output,
+        "k": args.k,
+        "replayed": bool(args.replay),
+        "config": {key: environ.get(key) for key in CONFIG_KEYS},
+        "summary": summarize(queries, args.k, args.prompt_price, args.completion_price,
+                             "replayed_" if args.replay else ""),
+        "queries": queries,
+    }
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(result, file, indent=2)
+
+    print_table([result])
+
+
+def print_table(results: List[dict]):
+    """Print the summaries side by side, with a delta column when comparing two runs."""
+    metrics = list(dict.fromkeys(metric for result in results for metric in result["summary"]))
+    headers = ["metric"] + [result["label"] for result in results] + (["delta"] if len(results) == 2 else [])
+
+    rows = []
+    for metric in metrics:
+        values = [result["summary"].get(metric) for result in results]
+        row = [metric] + ["-" if value is None else f"{value:.4f}" for value in values]
+        if len(results) == 2:
+            row.append(f"{values[1] - values[0]:+.4f}" if None not in values else "-")
+        rows.append(row)
+
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    for line in [headers, ["-" * width for width in widths]] + rows:
+        print("  ".join(str(cell).ljust(width) for cell, width in zip(line, widths)))
+
+
+def compare(args):
+    results = []
+    for path in (args.baseline, args.candidate):
+        with open(path, "r", encoding="utf-8") as file:
+            results.append(json.load(file))
+    print_table(results)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality and latency of the RAG pipeline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run a question/expected-page dataset through search and chat")
+    run_parser.add_argument('--dataset', type=str, required=True, help="JSONL file with question, title and pages")
+    run_parser.add_argument('--output', type=str, required=True, help="JSON file to write the results to")
+    run_parser.add_argument('--label', type=str, help="Name of this configuration in comparison tables")
+    run_parser.add_argument('--k', type=int, default=3, help="Number of documents to retrieve")
+    run_parser.add_argument('--env-file', type=str, help=".env file with the configuration to evaluate")
+    recording = run_parser.add_mutually_exclusive_group()
+    recording.add_argument('--record', type=str, help="JSONL file to record the raw search and LLM responses to")
+    recording.add_argument('--replay', type=str, help="JSONL file of recorded raw responses, runs the pipeline offline")
+    run_parser.add_argument('--no-answer', action='store_true', help="Only evaluate retrieval, skip the LLM")
+    run_parser.add_argument('--prompt-price', type=float, default=0.0025, help="Price per 1K prompt tokens")
+    run_parser.add_argument('--completion-price', type=float, default=0.01, help="Price per 1K completion tokens")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare the results of two runs")
+    compare_parser.add_argument('baseline', type=str)
+    compare_parser.add_argument('candidate', type=str)
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,8 @@
+import os
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each application under src/ is run from its own directory, mirror that on the import path
+sys.path[:0] = [os.path.join(ROOT, "src", "LocalLoader"), os.path.join(ROOT, "src", "Streamlit")]
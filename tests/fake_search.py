@@ -0,0 +1,46 @@
+import json
+import types
+
+from azure.core.pipeline.transport import HttpTransport
+from azure.core.rest._http_response_impl import HttpResponseImpl
+
+
+class FakeSearchTransport(HttpTransport):
+    """In-memory Azure AI Search document endpoint.
+
+    Records the URL and batch size of every request and answers 413 for
+    batches larger than max_batch, like the service does for oversized payloads.
+    """
+
+    def __init__(self, max_batch: int = 1000):
+        self.max_batch = max_batch
+        self.calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, request, **kwargs):
+        documents = json.loads(request.content)["value"]
+        self.calls.append((request.url, len(documents)))
+
+        status = 413 if len(documents) > self.max_batch else 200
+        body = {"value": [{"key": document["chunk_id"], "status": True} for document in documents]}
+
+        response = HttpResponseImpl(request=request,
+                                    internal_response=types.SimpleNamespace(close=lambda: None),
+                                    status_code=status,
+                                    reason="",
+                                    content_type="application/json",
+                                    headers={"Content-Type": "application/json"},
+                                    stream_download_generator=None)
+        response._content = json.dumps(body).encode()
+        return response
@@ -0,0 +1,54 @@
+import pytest
+from langchain_community.callbacks.manager import get_openai_callback
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from data.cassette import Cassette, RecordedChatModel
+
+
+class FakeSearchClient:
+    def __init__(self):
+        self.calls = 0
+
+    def search(self, **kwargs):
+        self.calls += 1
+        return iter([{"title": "contract.pdf", "pageNumber": 2, "@search.score": 0.5, "content_vector": [0.1, 0.2]}])
+
+
+class FakeChatModel(FakeListChatModel):
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = AIMessage(content="30 days", usage_metadata={"input_tokens": 120, "output_tokens": 4, "total_tokens": 124})
+        return ChatResult(generations=[ChatGeneration(message=message)], llm_output={"model_name": "gpt-4o"})
+
+
+def test_search_responses_replay_without_the_client(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    client = FakeSearchClient()
+
+    recorded = Cassette(path, "record").wrap("search:contract-index", client, ["search"]).search(search_text="notice", top=5)
+    replayed = Cassette(path, "replay").wrap("search:contract-index", None, ["search"]).search(search_text="notice", top=5)
+
+    assert client.calls == 1
+    assert replayed == recorded
+    assert replayed[0]["content_vector"] == [0.1, 0.2]
+
+
+def test_chat_completions_replay_with_token_usage(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+
+    recorded = RecordedChatModel(cassette=Cassette(path, "record"), llm=FakeChatModel(responses=[])).invoke("notice period?")
+
+    with get_openai_callback() as callback:
+        replayed = RecordedChatModel(cassette=Cassette(path, "replay")).invoke("notice period?")
+
+    assert replayed.content == recorded.content == "30 days"
+    assert (callback.prompt_tokens, callback.completion_tokens) == (120, 4)
+
+
+def test_unrecorded_requests_fail(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    Cassette(path, "record")
+
+    with pytest.raises(KeyError):
+        Cassette(path, "replay").wrap("embeddings", None, ["embed_query"]).embed_query("unseen")
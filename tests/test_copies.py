@@ -0,0 +1,22 @@
+import filecmp
+import os
+
+import pytest
+
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Each application is deployed on its own, shared modules are copied into each of them
+COPIES = [
+    ("LocalLoader/local_index.py", "Streamlit/data/local/index.py"),
+    ("LocalLoader/routing.py", "DocumentProcessingFunction/routing.py"),
+    ("LocalLoader/routing.py", "Streamlit/data/aisearch/routing.py"),
+    ("LocalLoader/embedding.py", "DocumentProcessingFunction/embedding.py"),
+    ("LocalLoader/staging.py", "DocumentProcessingFunction/staging.py"),
+]
+
+
+@pytest.mark.parametrize("source, copy", COPIES)
+def test_copies_match(source, copy):
+    assert filecmp.cmp(os.path.join(SRC, source), os.path.join(SRC, copy), shallow=False), \
+        f"src/{copy} differs from src/{source}, copy the change over"
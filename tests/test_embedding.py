@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents import SearchClient
+from azure.search.documents.indexes.models import SearchField, SearchIndex, SimpleField
+
+from embedding import BatchEmbedder, check_index_dimensions, upload_batch
+from fake_search import FakeSearchTransport
+
+
+class FakeEmbeddings:
+    def embed_query(self, text):
+        return [1.0] * 8
+
+    def embed_documents(self, texts):
+        return [[1.0] * 8 for _ in texts]
+
+
+def test_batch_embedder_truncates_and_normalizes():
+    embedder = BatchEmbedder(FakeEmbeddings(), dimensions=4)
+    vectors = embedder.embed(["a", "b"])
+
+    assert embedder.dimensions == 4
+    assert vectors.dtype == np.float32 and vectors.flags["C_CONTIGUOUS"]
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+
+
+def test_batch_embedder_ignores_dimensions_above_model():
+    assert BatchEmbedder(FakeEmbeddings(), dimensions=4096).dimensions == 8
+
+
+def test_upload_batch_posts_to_bound_index_and_splits_on_413():
+    transport = FakeSearchTransport(max_batch=2)
+    client = SearchClient("https://search.example.net", "contract-index-blue",
+                          AzureKeyCredential("key"), transport=transport, retry_total=0)
+    documents = [{"chunk_id": str(index)} for index in range(5)]
+
+    assert upload_batch(client, documents, np.ones((5, 4), dtype=np.float32)) == 5
+
+    urls = {url for url, _ in transport.calls}
+    assert urls == {"https://search.example.net/indexes('contract-index-blue')/docs/search.index?api-version=2023-11-01"}
+    assert sum(size for _, size in transport.calls if size <= 2) == 5
+
+
+def test_existing_index_dimensions_must_match():
+    index = SearchIndex(name="contract-index", fields=[
+        SimpleField(name="chunk_id", type="Edm.String", key=True),
+        SearchField(name="content_vector", type="Collection(Edm.Single)", vector_search_dimensions=1536),
+    ])
+
+    check_index_dimensions(index, 1536)
+    with pytest.raises(ValueError, match="1536"):
+        check_index_dimensions(index, 1024)
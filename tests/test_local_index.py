@@ -0,0 +1,57 @@
+import numpy as np
+
+from local_index import LocalIndex
+
+
+TEXTS = ["The termination notice period is ninety days",
+         "Fees are payable by the customer within thirty days",
+         "Confidential information must not be disclosed",
+         "Either party may terminate for material breach"]
+
+
+def _index(path, **kwargs):
+    index = LocalIndex(str(path), **kwargs)
+    documents = [{"chunk_id": str(i), "content": text, "title": "contract.pdf", "pageNumber": str(i + 1)}
+                 for i, text in enumerate(TEXTS)]
+    index.add_documents(documents, np.eye(len(TEXTS), 8, dtype=np.float32))
+    return index
+
+
+def test_hybrid_search_fuses_keyword_and_vector_rankings(tmp_path):
+    index = _index(tmp_path)
+
+    # Keyword match on page 1, vector match on page 2: both rank first in one list
+    results = index.hybrid_search("termination notice", np.eye(1, 8, 1, dtype=np.float32)[0], top=4)
+
+    assert {result["pageNumber"] for result in results[:2]} == {"1", "2"}
+    assert all(results[i]["@search.score"] >= results[i + 1]["@search.score"] for i in range(len(results) - 1))
+    assert results[0]["content_vector"].shape == (8,)
+
+
+def test_agreeing_rankings_score_highest(tmp_path):
+    index = _index(tmp_path)
+
+    results = index.hybrid_search("fees payable", np.eye(1, 8, 1, dtype=np.float32)[0], top=3)
+
+    assert results[0]["pageNumber"] == "2"
+    assert results[0]["@search.score"] > results[1]["@search.score"]
+
+
+def test_segments_reload_from_disk(tmp_path):
+    _index(tmp_path)
+
+    results = LocalIndex(str(tmp_path)).hybrid_search("confidential", np.eye(1, 8, 2, dtype=np.float32)[0], top=1)
+
+    assert results[0]["pageNumber"] == "3"
+    assert results[0]["title"] == "contract.pdf"
+
+
+def test_uploading_a_chunk_id_again_replaces_it(tmp_path):
+    _index(tmp_path)
+    index = _index(tmp_path)
+
+    results = index.hybrid_search("termination notice", np.eye(1, 8, 0, dtype=np.float32)[0], top=8)
+
+    assert len(index.documents) == 8
+    assert sorted(result["chunk_id"] for result in results) == ["0", "1", "2", "3"]
+    assert sorted(doc_id for doc_id, _ in index.vector_search(np.ones(8), top=8)) == [4, 5, 6, 7]
@@ -0,0 +1,47 @@
+import logging
+
+import numpy as np
+
+from data.aisearch.rerank import rerank
+
+
+def _candidates(vectors):
+    return [{"title": f"doc-{i}", "content_vector": vector} for i, vector in enumerate(vectors)]
+
+
+def test_cosine_orders_by_similarity():
+    candidates = _candidates([[0.0, 1.0], [1.0, 0.1], [1.0, 0.5], [-1.0, 0.0]])
+
+    results = rerank(np.array([1.0, 0.0]), candidates, k=3, mode="cosine")
+
+    assert [result["title"] for result in results] == ["doc-1", "doc-2", "doc-0"]
+
+
+def test_mmr_prefers_diverse_results():
+    # Two near duplicates and one less similar but different candidate
+    candidates = _candidates([[1.0, 0.0], [0.999, 0.001], [0.6, 0.8]])
+
+    cosine = rerank(np.array([1.0, 0.2]), candidates, k=2, mode="cosine")
+    mmr = rerank(np.array([1.0, 0.2]), candidates, k=2, mode="mmr", lambda_mult=0.5)
+
+    assert {result["title"] for result in cosine} == {"doc-0", "doc-1"}
+    assert "doc-2" in {result["title"] for result in mmr}
+
+
+def test_mmr_budget_fills_by_similarity_and_logs(caplog):
+    rng = np.random.default_rng(0)
+    candidates = _candidates(rng.normal(size=(20, 8)))
+    query_vector = rng.normal(size=8)
+
+    with caplog.at_level(logging.WARNING):
+        results = rerank(query_vector, candidates, k=5, mode="mmr", budget_ms=1e-9)
+
+    cosine = rerank(query_vector, candidates, k=5, mode="cosine")
+    assert len(results) == 5
+    assert results[0] is cosine[0]
+    assert [r["title"] for r in results[1:]] == [r["title"] for r in cosine[1:]]
+    assert "budget" in caplog.text
+
+
+def test_empty_candidates():
+    assert rerank(np.array([1.0, 0.0]), [], k=3, mode="mmr") == []
@@ -0,0 +1,46 @@
+from datetime import date
+
+import pytest
+
+from routing import IndexRouter
+
+
+EXISTING = ["contract-index", "contract-index-v2", "contract-index-tenant-contoso",
+            "contract-index-tenant-fabrikam", "contract-index-collection-legal",
+            "contract-index-2024-05", "contract-index-2024-06", "contract-index-2024-07"]
+
+
+def test_shard_names():
+    assert IndexRouter("contract-index", "none").shard_for("contoso") == "contract-index"
+    assert IndexRouter("contract-index", "tenant").shard_for("Contoso Ltd") == "contract-index-tenant-contoso-ltd"
+    assert IndexRouter("contract-index", "date").shard_for(document_date=date(2024, 6, 30)) == "contract-index-2024-06"
+
+    with pytest.raises(ValueError):
+        IndexRouter("contract-index", "tenant").shard_for()
+
+
+def test_tenant_queries_never_fan_out():
+    router = IndexRouter("contract-index", "tenant")
+
+    assert router.shards_for_query(EXISTING) == []
+    assert router.shards_for_query(EXISTING, key="contoso") == ["contract-index-tenant-contoso"]
+    assert router.shards_for_query(EXISTING, key="unknown") == []
+
+
+def test_collection_queries_fan_out_to_matching_shards_only():
+    router = IndexRouter("contract-index", "collection")
+
+    assert router.shards_for_query(EXISTING) == ["contract-index-collection-legal"]
+    assert router.shards_for_query(EXISTING, key="legal") == ["contract-index-collection-legal"]
+
+
+def test_date_queries():
+    router = IndexRouter("contract-index", "date")
+
+    assert router.shards_for_query(EXISTING) == ["contract-index-2024-05", "contract-index-2024-06", "contract-index-2024-07"]
+    assert router.shards_for_query(EXISTING, date_from=date(2024, 6, 1), date_to=date(2024, 7, 15)) == [
+        "contract-index-2024-06", "contract-index-2024-07"]
+
+
+def test_unsharded_queries_use_the_base_index():
+    assert IndexRouter("contract-index", "none").shards_for_query(EXISTING) == ["contract-index"]
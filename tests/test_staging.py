@@ -0,0 +1,47 @@
+import logging
+
+import numpy as np
+
+from bulk_upload import staged_shards
+from staging import StagingWriter, read_staging
+
+
+def _documents(count):
+    return [{"chunk_id": str(i), "content": f"chunk {i}", "title": "contract.pdf", "pageNumber": i % 7 + 1}
+            for i in range(count)]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "staged.parquet")
+    documents = _documents(30)
+    vectors = np.random.default_rng(0).normal(size=(30, 16)).astype(np.float32)
+
+    writer = StagingWriter(path, 16)
+    writer.write(documents[:20], vectors[:20])
+    writer.write(documents[20:], vectors[20:])
+    writer.close()
+
+    batches = list(read_staging(path, batch_size=8))
+
+    read_documents = [document for batch, _ in batches for document in batch]
+    assert read_documents == [{**document, "pageNumber": str(document["pageNumber"])} for document in documents]
+    assert np.array_equal(np.concatenate([batch_vectors for _, batch_vectors in batches]), vectors)
+    assert all(batch_vectors.dtype == np.float32 for _, batch_vectors in batches)
+
+
+def test_staged_shards_skip_unreadable_files(tmp_path, caplog):
+    shard = tmp_path / "contract-index-tenant-contoso"
+    shard.mkdir()
+
+    writer = StagingWriter(str(shard / "complete.parquet"), 4)
+    writer.write(_documents(2), np.ones((2, 4), dtype=np.float32))
+    writer.close()
+
+    # A file whose writer was never closed has no footer
+    (shard / "truncated.parquet").write_bytes(b"PAR1" + b"\0" * 32)
+
+    with caplog.at_level(logging.WARNING):
+        shards = staged_shards(str(tmp_path))
+
+    assert shards == {"contract-index-tenant-contoso": [str(shard / "complete.parquet")]}
+    assert "truncated.parquet" in caplog.text